@@ -0,0 +1,35 @@
+"""FastAPI dependencies for provider integrations."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from fastapi import Depends, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+if TYPE_CHECKING:
+    from app.integrations import GoogleWorkspaceIntegration, Microsoft365Integration
+
+bearer_scheme = HTTPBearer()
+
+
+def get_ms_integration(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> Microsoft365Integration:
+    """Build a Microsoft 365 integration on the app's shared HTTP client."""
+    # Imported per call so this module loads without the provider stacks
+    from app.integrations import Microsoft365Integration
+
+    return Microsoft365Integration(
+        credentials.credentials, client=request.app.state.http
+    )
+
+
+def get_google_integration(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> GoogleWorkspaceIntegration:
+    """Build a Google Workspace integration for the caller's token."""
+    from app.integrations import GoogleWorkspaceIntegration
+
+    return GoogleWorkspaceIntegration(credentials.credentials)
@@ -1,12 +1,33 @@
 """Integration modules for external services."""
 
-from .base import BaseIntegration, IntegrationException
-from .google import GoogleWorkspaceIntegration
-from .microsoft import Microsoft365Integration
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from .base import BaseIntegration, Identifier, IntegrationException
+
+if TYPE_CHECKING:
+    from .google import GoogleWorkspaceIntegration
+    from .microsoft import Microsoft365Integration
+
+# Provider modules pull in their SDKs and app settings, so they are only
+# imported when first used rather than with the package
+_LAZY_IMPORTS = {
+    "GoogleWorkspaceIntegration": ".google",
+    "Microsoft365Integration": ".microsoft",
+}
 
 __all__ = [
     "BaseIntegration",
     "GoogleWorkspaceIntegration",
+    "Identifier",
     "IntegrationException",
     "Microsoft365Integration",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """Import provider integrations on first access."""
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module, __name__), name)
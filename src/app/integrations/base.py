@@ -1,6 +1,8 @@
 """Base integration abstract class."""
 
+import hashlib
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from typing import Any, Tuple
 
 
@@ -16,6 +18,19 @@ class IntegrationException(Exception):
         self.operation = operation
 
 
+@dataclass(slots=True)
+class Identifier:
+    """Contact identifier such as an email address or phone number."""
+
+    type: str
+    value: str
+
+
+def token_fingerprint(token: str) -> str:
+    """Return a short, non-reversible key identifying a token."""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
 class BaseIntegration(ABC):
     """Abstract base class for third-party integrations."""
 
@@ -27,6 +42,8 @@ class BaseIntegration(ABC):
             access_token: OAuth access token
         """
         self.access_token = access_token
+        # Identifies the user to the rate limiter, which backs off per user
+        self.rate_limit_scope = token_fingerprint(access_token)
 
     @abstractmethod
     async def get_contacts(
@@ -56,6 +73,21 @@ class BaseIntegration(ABC):
         """
         pass
 
+    @abstractmethod
+    async def get_email_contents_bulk(
+        self, email_ids: list[str]
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch full content of many emails in as few requests as possible.
+
+        Args:
+            email_ids: Email identifiers
+
+        Returns:
+            Email data for each email that could be fetched
+        """
+        pass
+
     @abstractmethod
     async def get_calendar_event(self, event_id: str) -> dict[str, Any]:
         """
@@ -0,0 +1,41 @@
+"""Parsing of Gmail message payloads."""
+
+from base64 import urlsafe_b64decode
+from typing import Any, Tuple
+
+
+def walk_payload(payload: dict[str, Any]) -> Tuple[str, bool]:
+    """
+    Extract the plain text body and attachment flag from a Gmail payload.
+
+    Args:
+        payload: The "payload" of a message fetched with format "full"
+
+    Returns:
+        Tuple of (text/plain parts joined in document order, whether the
+        message has attachments)
+    """
+    # Single-part message
+    if "parts" not in payload:
+        data = payload["body"].get("data")
+        if not data:
+            return "", False
+        return urlsafe_b64decode(data).decode("utf-8", errors="replace"), False
+
+    chunks: list[bytes] = []
+    has_attachments = False
+
+    # Walk nested multiparts depth-first, in document order
+    stack = payload["parts"][::-1]
+    while stack:
+        part = stack.pop()
+        if (part.get("filename") or "").strip():
+            has_attachments = True
+        elif "parts" in part:
+            stack.extend(reversed(part["parts"]))
+        elif part.get("mimeType") == "text/plain":
+            data = part["body"].get("data")
+            if data:
+                chunks.append(urlsafe_b64decode(data))
+
+    return b"".join(chunks).decode("utf-8", errors="replace"), has_attachments
@@ -1,23 +1,78 @@
 """Google Workspace integration implementation."""
 
+import asyncio
 import logging
-from typing import Any, Tuple
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import datetime
+from functools import cached_property, partial
+from typing import Any, Callable, Tuple
 
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource, build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest, HttpRequest
 
 from app.config import settings
-from app.integrations.base import BaseIntegration, IntegrationException
+from app.integrations.base import (
+    BaseIntegration,
+    Identifier,
+    IntegrationException,
+    token_fingerprint,
+)
+from app.integrations.gmail_payload import walk_payload
+from app.integrations.google_api import discovery_document, google_retry_after
+from app.integrations.rate_limit import (
+    MAX_RETRIES,
+    call_with_retry,
+    resend_transient,
+)
 
 logger = logging.getLogger(__name__)
 
+# Gmail accepts up to 100 calls per batch but starts rate limiting
+# batches larger than 50.
+_GMAIL_BATCH_SIZE = 50
+
+# Most users whose refreshed access tokens are kept
+_TOKEN_CACHE_SIZE = 10_000
+
+# Access tokens refreshed by this process, keyed by a fingerprint of the
+# refresh token, as (access token, naive UTC expiry), least recently
+# used first
+_token_cache: OrderedDict[str, tuple[str, datetime]] = OrderedDict()
+
+
+def _cached_token(key: str) -> tuple[str, datetime] | None:
+    """Return a cached token that google-auth would use without refreshing."""
+    cached = _token_cache.get(key)
+    if cached is None:
+        return None
+    # Let google-auth judge expiry, so a reused token is not refreshed
+    # again on its first request
+    if Credentials(token=cached[0], expiry=cached[1]).expired:
+        del _token_cache[key]
+        return None
+    _token_cache.move_to_end(key)
+    return cached
+
+
+def _cache_token(key: str, token: str, expiry: datetime) -> None:
+    """Cache a refreshed token, evicting the least recently used user."""
+    _token_cache[key] = (token, expiry)
+    _token_cache.move_to_end(key)
+    if len(_token_cache) > _TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
 
 class GoogleWorkspaceIntegration(BaseIntegration):
     """Google Workspace API integration."""
 
     def __init__(
-        self, access_token: str, refresh_token: str | None = None
+        self,
+        access_token: str,
+        refresh_token: str | None = None,
+        token_expiry: datetime | None = None,
     ) -> None:
         """
         Initialize Google Workspace integration.
@@ -25,28 +80,118 @@ class GoogleWorkspaceIntegration(BaseIntegration):
         Args:
             access_token: OAuth access token
             refresh_token: Optional refresh token for token renewal
+            token_expiry: Optional access token expiry, naive UTC
         """
+        # Identifies the user across access token refreshes
+        user_key = token_fingerprint(refresh_token) if refresh_token else None
+
+        # Prefer a token this process already refreshed for the user, if
+        # it outlives the given one
+        cached = _cached_token(user_key) if user_key else None
+        if cached and (token_expiry is None or cached[1] > token_expiry):
+            access_token, token_expiry = cached
+
         super().__init__(access_token)
         self.refresh_token = refresh_token
+        self._user_key = user_key
+        if user_key:
+            self.rate_limit_scope = user_key
 
-        # Create credentials object
+        # Create credentials object. With a known expiry google-auth
+        # refreshes only when the token is about to expire, instead of
+        # after a request fails with 401.
         self.credentials = Credentials(
             token=access_token,
             refresh_token=refresh_token,
+            expiry=token_expiry,
             token_uri="https://oauth2.googleapis.com/token",
             client_id=settings.GOOGLE_CLIENT_ID,
             client_secret=settings.GOOGLE_CLIENT_SECRET,
         )
 
-        # Build service clients
-        self.gmail_service = build("gmail", "v1", credentials=self.credentials)
-        self.calendar_service = build(
-            "calendar", "v3", credentials=self.credentials
+        # Serializes calls made from worker threads
+        self._http_lock = asyncio.Lock()
+
+    @cached_property
+    def gmail_service(self) -> Resource:
+        """Gmail API client, built on first use."""
+        return self._build_service("gmail", "v1")
+
+    @cached_property
+    def calendar_service(self) -> Resource:
+        """Calendar API client, built on first use."""
+        return self._build_service("calendar", "v3")
+
+    @cached_property
+    def people_service(self) -> Resource:
+        """People API client, built on first use."""
+        return self._build_service("people", "v1")
+
+    def _build_service(self, service_name: str, version: str) -> Resource:
+        """Build a service client from the cached discovery document."""
+        return build_from_document(
+            discovery_document(service_name, version),
+            credentials=self.credentials,
         )
-        self.people_service = build(
-            "people", "v1", credentials=self.credentials
+
+    async def _execute(
+        self,
+        build_request: Callable[[], HttpRequest | BatchHttpRequest],
+        idempotent: bool,
+    ) -> Any:
+        """
+        Execute a Google API request with retries.
+
+        Args:
+            build_request: Builds the request or batch to execute. It is
+                called in the worker thread, so building a service client
+                on first use does not block the event loop
+            idempotent: Whether the request is safe to resend
+
+        Returns:
+            Decoded response
+        """
+        return await call_with_retry(
+            partial(self._execute_once, build_request),
+            "google_workspace",
+            partial(google_retry_after, idempotent=idempotent),
+            scope=self.rate_limit_scope,
         )
 
+    async def _execute_once(
+        self, build_request: Callable[[], HttpRequest | BatchHttpRequest]
+    ) -> Any:
+        """Build and execute a Google API request in a worker thread."""
+        # Service clients share one httplib2.Http and one set of
+        # credentials, neither of which is thread-safe
+        async with self._http_lock:
+            execution = asyncio.ensure_future(
+                asyncio.to_thread(lambda: build_request().execute())
+            )
+            try:
+                return await asyncio.shield(execution)
+            except asyncio.CancelledError:
+                # The worker thread cannot be stopped, so the lock is held
+                # until it finishes, even through repeated cancellation
+                while not execution.done():
+                    with suppress(asyncio.CancelledError):
+                        await asyncio.wait({execution})
+                # Nobody is left to handle the call's outcome
+                execution.exception()
+                raise
+            finally:
+                self._store_refreshed_token()
+
+    def _store_refreshed_token(self) -> None:
+        """Cache the access token if google-auth refreshed it."""
+        credentials = self.credentials
+        if credentials.token == self.access_token:
+            return
+
+        self.access_token = credentials.token
+        if self._user_key and credentials.expiry:
+            _cache_token(self._user_key, credentials.token, credentials.expiry)
+
     async def get_contacts(
         self, sync_token: str | None = None
     ) -> Tuple[list[dict[str, Any]], str | None]:
@@ -68,7 +213,9 @@ class GoogleWorkspaceIntegration(BaseIntegration):
                 # Build request parameters
                 params = {
                     "resourceName": "people/me",
-                    "pageSize": 100,
+                    # Largest page the People API allows; page tokens are
+                    # opaque, so fewer pages is the only way to cut trips
+                    "pageSize": 1000,
                     "personFields": "names,emailAddresses,phoneNumbers,metadata",
                 }
 
@@ -81,11 +228,11 @@ class GoogleWorkspaceIntegration(BaseIntegration):
 
                 # Execute request
                 try:
-                    response = (
-                        self.people_service.people()
+                    response = await self._execute(
+                        lambda: self.people_service.people()
                         .connections()
-                        .list(**params)
-                        .execute()
+                        .list(**params),
+                        idempotent=True,
                     )
                 except HttpError as e:
                     if e.resp.status == 410:  # Sync token expired
@@ -122,6 +269,13 @@ class GoogleWorkspaceIntegration(BaseIntegration):
         self, connection: dict[str, Any]
     ) -> dict[str, Any] | None:
         """Parse Google contact data."""
+        emails = connection.get("emailAddresses")
+        phones = connection.get("phoneNumbers")
+
+        # Skip contacts without any identifier before building anything
+        if not emails and not phones:
+            return None
+
         contact = {"id": connection.get("resourceName"), "identifiers": []}
 
         # Extract name
@@ -130,19 +284,14 @@ class GoogleWorkspaceIntegration(BaseIntegration):
             contact["name"] = names[0].get("displayName")
 
         # Extract emails
-        for email in connection.get("emailAddresses", []):
-            contact["identifiers"].append(
-                {"type": "email", "value": email.get("value")}
-            )
+        for email in emails or ():
+            contact["identifiers"].append(Identifier("email", email.get("value")))
 
         # Extract phone numbers
-        for phone in connection.get("phoneNumbers", []):
-            contact["identifiers"].append(
-                {"type": "phone", "value": phone.get("value")}
-            )
+        for phone in phones or ():
+            contact["identifiers"].append(Identifier("phone", phone.get("value")))
 
-        # Only return if we have at least one identifier
-        return contact if contact["identifiers"] else None
+        return contact
 
     async def get_email_content(self, email_id: str) -> dict[str, Any]:
         """
@@ -156,11 +305,11 @@ class GoogleWorkspaceIntegration(BaseIntegration):
         """
         try:
             # Get message
-            message = (
-                self.gmail_service.users()
+            message = await self._execute(
+                lambda: self.gmail_service.users()
                 .messages()
-                .get(userId="me", id=email_id, format="full")
-                .execute()
+                .get(userId="me", id=email_id, format="full"),
+                idempotent=True,
             )
 
             # Parse message
@@ -174,6 +323,83 @@ class GoogleWorkspaceIntegration(BaseIntegration):
                 operation="get_email_content",
             )
 
+    async def get_email_contents_bulk(
+        self, email_ids: list[str]
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch full content of many emails using Gmail batch requests.
+
+        Args:
+            email_ids: Gmail message IDs
+
+        Returns:
+            Email data for each message that could be fetched, in the
+            order of the given IDs
+        """
+        results: dict[str, dict[str, Any]] = {}
+
+        async def send(pending: list[str]) -> dict[str, float]:
+            # Delay requested for each message that failed transiently
+            throttled: dict[str, float] = {}
+
+            def _on_message(
+                request_id: str, response: dict[str, Any], exception: Exception
+            ) -> None:
+                if exception is not None:
+                    retry_after = google_retry_after(exception)
+                    if retry_after is not None:
+                        throttled[request_id] = retry_after
+                        return
+                    logger.warning(
+                        f"Failed to fetch Gmail message {request_id}: "
+                        f"{str(exception)}"
+                    )
+                    return
+                results[request_id] = self._parse_gmail_message(response)
+
+            def build_batch() -> BatchHttpRequest:
+                batch = self.gmail_service.new_batch_http_request()
+                for email_id in pending:
+                    batch.add(
+                        self.gmail_service.users()
+                        .messages()
+                        .get(userId="me", id=email_id, format="full"),
+                        callback=_on_message,
+                        request_id=email_id,
+                    )
+                return batch
+
+            # Every call in the batch is a GET
+            await self._execute(build_batch, idempotent=True)
+            return throttled
+
+        # Batch request IDs must be unique
+        unique_ids = list(dict.fromkeys(email_ids))
+
+        try:
+            for start in range(0, len(unique_ids), _GMAIL_BATCH_SIZE):
+                throttled = await resend_transient(
+                    send,
+                    unique_ids[start : start + _GMAIL_BATCH_SIZE],
+                    "google_workspace",
+                    scope=self.rate_limit_scope,
+                )
+                if throttled:
+                    logger.warning(
+                        f"Failed to fetch {len(throttled)} Gmail messages: "
+                        f"still throttled after {MAX_RETRIES} retries"
+                    )
+
+            return [results[i] for i in email_ids if i in results]
+
+        except Exception as e:
+            logger.error(f"Failed to fetch Gmail messages: {str(e)}")
+            raise IntegrationException(
+                f"Failed to fetch emails: {str(e)}",
+                provider="google_workspace",
+                operation="get_email_contents_bulk",
+            )
+
     def _parse_gmail_message(self, message: dict[str, Any]) -> dict[str, Any]:
         """Parse Gmail message data."""
         headers = message["payload"].get("headers", [])
@@ -181,15 +407,8 @@ class GoogleWorkspaceIntegration(BaseIntegration):
         # Extract headers
         header_dict = {h["name"]: h["value"] for h in headers}
 
-        # Extract body
-        body = self._extract_message_body(message["payload"])
-
-        has_attachments = False
-        if "parts" in message["payload"]:
-            for part in message["payload"]["parts"]:
-                if part.get("filename") and part["filename"].strip():
-                    has_attachments = True
-                    break
+        # Extract body and attachment flag
+        body, has_attachments = walk_payload(message["payload"])
 
         return {
             "id": message["id"],
@@ -204,28 +423,6 @@ class GoogleWorkspaceIntegration(BaseIntegration):
             "has_attachments": has_attachments,
         }
 
-    def _extract_message_body(self, payload: dict[str, Any]) -> str:
-        """Extract body from Gmail message payload."""
-        body = ""
-
-        # Check for parts
-        if "parts" in payload:
-            for part in payload["parts"]:
-                if part["mimeType"] == "text/plain":
-                    data = part["body"].get("data", "")
-                    if data:
-                        import base64
-
-                        body += base64.urlsafe_b64decode(data).decode("utf-8")
-        elif payload["body"].get("data"):
-            import base64
-
-            body = base64.urlsafe_b64decode(payload["body"]["data"]).decode(
-                "utf-8"
-            )
-
-        return body
-
     async def get_calendar_event(self, event_id: str) -> dict[str, Any]:
         """
         Fetch calendar event from Google Calendar.
@@ -237,10 +434,11 @@ class GoogleWorkspaceIntegration(BaseIntegration):
             Event data
         """
         try:
-            event = (
-                self.calendar_service.events()
-                .get(calendarId="primary", eventId=event_id)
-                .execute()
+            event = await self._execute(
+                lambda: self.calendar_service.events().get(
+                    calendarId="primary", eventId=event_id
+                ),
+                idempotent=True,
             )
 
             return {
@@ -285,8 +483,8 @@ class GoogleWorkspaceIntegration(BaseIntegration):
             subscriptions = {}
 
             # Subscribe to Gmail
-            gmail_watch = (
-                self.gmail_service.users()
+            gmail_watch = await self._execute(
+                lambda: self.gmail_service.users()
                 .watch(
                     userId="me",
                     body={
@@ -294,8 +492,8 @@ class GoogleWorkspaceIntegration(BaseIntegration):
                         "labelIds": ["INBOX"],
                         "labelFilterAction": "include",
                     },
-                )
-                .execute()
+                ),
+                idempotent=False,
             )
 
             subscriptions["gmail"] = {
@@ -309,8 +507,8 @@ class GoogleWorkspaceIntegration(BaseIntegration):
 
             channel_id = str(uuid.uuid4())
 
-            calendar_watch = (
-                self.calendar_service.events()
+            calendar_watch = await self._execute(
+                lambda: self.calendar_service.events()
                 .watch(
                     calendarId="primary",
                     body={
@@ -319,8 +517,8 @@ class GoogleWorkspaceIntegration(BaseIntegration):
                         "address": f"https://pubsub.googleapis.com/v1/projects/{settings.GCP_PROJECT_ID}/topics/{settings.PUBSUB_TOPIC}:publish",
                         "params": {"userId": user_id},
                     },
-                )
-                .execute()
+                ),
+                idempotent=False,
             )
 
             subscriptions["calendar"] = {
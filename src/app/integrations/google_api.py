@@ -0,0 +1,67 @@
+"""Google API plumbing that does not depend on app settings."""
+
+import json
+from functools import lru_cache
+
+import httplib2
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+
+from app.integrations.rate_limit import parse_retry_after
+
+# 403 reasons Google uses for quota throttling rather than access denial
+_RATE_LIMIT_REASONS = frozenset({"rateLimitExceeded", "userRateLimitExceeded"})
+
+# Errors raised before a request reaches Google, safe to retry for any method
+_UNSENT_ERRORS = (ConnectionRefusedError, httplib2.ServerNotFoundError)
+
+# Google APIs used by the integration, as (service name, version)
+_SERVICES = (("gmail", "v1"), ("calendar", "v3"), ("people", "v1"))
+
+
+@lru_cache(maxsize=None)
+def discovery_document(service_name: str, version: str) -> str:
+    """Load a discovery document bundled with googleapiclient once."""
+    document = get_static_doc(service_name, version)
+    if document is None:
+        raise ValueError(
+            f"No discovery document bundled for {service_name} {version}"
+        )
+    return document
+
+
+def google_retry_after(
+    error: Exception, idempotent: bool = True
+) -> float | None:
+    """
+    Return the retry delay for transient Google errors, None otherwise.
+
+    Requests that are not idempotent are only retried when Google cannot
+    have acted on them: throttled, unavailable, or never sent.
+    """
+    if isinstance(error, _UNSENT_ERRORS):
+        return 0.0
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return 0.0 if idempotent else None
+    # BatchError is an HttpError that may carry no response
+    if not isinstance(error, HttpError) or error.resp is None:
+        return None
+
+    status = error.resp.status
+    if status in (429, 503) or (idempotent and status >= 500):
+        return parse_retry_after(error.resp.get("retry-after"))
+    if status == 403:
+        try:
+            errors = json.loads(error.content)["error"]["errors"]
+            reasons = {e.get("reason") for e in errors}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if reasons & _RATE_LIMIT_REASONS:
+            return 0.0
+    return None
+
+
+def warm_discovery_cache() -> None:
+    """Load the discovery documents of every service used into the cache."""
+    for service_name, version in _SERVICES:
+        discovery_document(service_name, version)
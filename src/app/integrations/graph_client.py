@@ -0,0 +1,142 @@
+"""Shared HTTP client and response handling for Microsoft Graph."""
+
+from typing import Any, Callable
+
+import httpx
+import ijson
+from ijson.common import ObjectBuilder
+
+from app.integrations.metrics import GRAPH_EVENT_HOOKS
+from app.integrations.rate_limit import parse_retry_after
+
+GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+
+# Errors raised before a request reaches Graph, safe to retry for any method
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_shared_client: httpx.AsyncClient | None = None
+
+
+def create_graph_client() -> httpx.AsyncClient:
+    """
+    Create a pooled HTTP client for Microsoft Graph.
+
+    Connections are kept alive between calls so warm requests skip the
+    TCP and TLS handshakes, and HTTP/2 lets concurrent requests share a
+    single connection. Request latency is recorded through event hooks.
+
+    Returns:
+        Configured async HTTP client
+    """
+    return httpx.AsyncClient(
+        base_url=GRAPH_BASE_URL,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        http2=True,
+        headers={"Content-Type": "application/json"},
+        event_hooks=GRAPH_EVENT_HOOKS,
+    )
+
+
+def get_graph_client() -> httpx.AsyncClient:
+    """Return the process-wide Graph client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_graph_client()
+    return _shared_client
+
+
+async def close_graph_client() -> None:
+    """Close the process-wide Graph client."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
+
+def graph_retry_after(error: Exception, idempotent: bool = True) -> float | None:
+    """
+    Return the retry delay for transient Graph errors, None otherwise.
+
+    Requests that are not idempotent are only retried when Graph cannot
+    have acted on them: throttled, unavailable, or never sent.
+    """
+    if isinstance(error, _UNSENT_ERRORS):
+        return 0.0
+    if isinstance(error, httpx.TransportError):
+        return 0.0 if idempotent else None
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        return status_retry_after(
+            response.status_code, response.headers, idempotent
+        )
+    return None
+
+
+def status_retry_after(
+    status: int, headers: httpx.Headers, idempotent: bool
+) -> float | None:
+    """Return the retry delay for a transient Graph status, None otherwise."""
+    if status in (429, 503) or (idempotent and status >= 500):
+        return parse_retry_after(headers.get("Retry-After"))
+    return None
+
+
+def is_idempotent(method: str, url: str, body: dict[str, Any] | None) -> bool:
+    """Whether a Graph request can be resent without repeating side effects."""
+    if method == "GET":
+        return True
+    # A JSON batch is as safe to resend as all of its subrequests
+    return (
+        url == "/$batch"
+        and body is not None
+        and all(request["method"] == "GET" for request in body["requests"])
+    )
+
+
+class ContactPageParser:
+    """Incrementally parse a Graph contacts page as its bytes arrive."""
+
+    _LINKS = frozenset({"@odata.nextLink", "@odata.deltaLink"})
+
+    def __init__(
+        self, parse_contact: Callable[[dict[str, Any]], dict[str, Any] | None]
+    ) -> None:
+        self.contacts: list[dict[str, Any]] = []
+        self.links: dict[str, str] = {}
+        self._parse_contact = parse_contact
+        self._builder: ObjectBuilder | None = None
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events, use_float=True)
+
+    def feed(self, chunk: bytes) -> None:
+        """Parse the next chunk of the response body."""
+        self._parser.send(chunk)
+        self._consume_events()
+
+    def close(self) -> None:
+        """Finish parsing once the whole body has been fed."""
+        self._parser.close()
+        self._consume_events()
+
+    def _consume_events(self) -> None:
+        """Build contacts from the "value" array and collect page links."""
+        for prefix, event, value in self._events:
+            if prefix == "value.item" and event == "start_map":
+                self._builder = ObjectBuilder()
+
+            if self._builder is not None:
+                self._builder.event(event, value)
+                if prefix == "value.item" and event == "end_map":
+                    contact_data = self._parse_contact(self._builder.value)
+                    if contact_data:
+                        self.contacts.append(contact_data)
+                    self._builder = None
+            elif prefix in self._LINKS:
+                self.links[prefix] = value
+
+        del self._events[:]
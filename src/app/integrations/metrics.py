@@ -0,0 +1,44 @@
+"""Prometheus metrics for provider HTTP calls."""
+
+import time
+
+import httpx
+from prometheus_client import Histogram
+
+GRAPH_REQUEST_SECONDS = Histogram(
+    "graph_request_seconds",
+    "Time from sending a Microsoft Graph request to receiving its headers",
+    ["method", "endpoint", "status"],
+)
+
+
+def _endpoint(path: str) -> str:
+    """Collapse IDs in a Graph path so it can be used as a metric label."""
+    segments = path.split("/")[2:]  # drop the API version
+    return "/" + "/".join(
+        "{id}" if len(s) >= 20 or any(c.isdigit() for c in s) else s
+        for s in segments
+    )
+
+
+async def _on_request(request: httpx.Request) -> None:
+    """Record when a Graph request is sent."""
+    request.extensions["timestamp"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response) -> None:
+    """Observe the latency of a Graph response."""
+    request = response.request
+    started = request.extensions.get("timestamp")
+    if started is None:
+        return
+
+    GRAPH_REQUEST_SECONDS.labels(
+        method=request.method,
+        endpoint=_endpoint(request.url.path),
+        status=response.status_code,
+    ).observe(time.perf_counter() - started)
+
+
+# Event hooks for the shared Graph client, so call sites stay uninstrumented
+GRAPH_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
@@ -1,34 +1,133 @@
 """Microsoft 365 integration implementation."""
 
+import asyncio
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Any, Tuple
+from datetime import UTC, datetime, timedelta
+from types import MappingProxyType
+from typing import Any, Generator, Tuple
+from urllib.parse import unquote_plus
 
 import httpx
+import orjson
 
 from app.core.security import generate_client_state
-from app.integrations.base import BaseIntegration, IntegrationException
+from app.integrations.base import (
+    BaseIntegration,
+    Identifier,
+    IntegrationException,
+)
+from app.integrations.graph_client import (
+    GRAPH_BASE_URL,
+    ContactPageParser,
+    get_graph_client,
+    graph_retry_after,
+    is_idempotent,
+    status_retry_after,
+)
+from app.integrations.rate_limit import (
+    DEFAULT_CONCURRENCY,
+    call_with_retry,
+    instance_scope,
+    resend_transient,
+    with_retry,
+)
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of subrequests Graph accepts in one $batch call
+_GRAPH_BATCH_SIZE = 20
+
+# Batches in flight per integration. Graph throttles every subrequest
+# against the mailbox's limits, so a large fan-out is sent a few at a time
+_GRAPH_BATCH_CONCURRENCY = 4
+
+_CONTACTS_PAGE_SIZE = 100
+
+# Number of contact pages requested concurrently during a full sync. More
+# would only queue in the rate limiter, and every page of the last round
+# past the end of the listing is a wasted request
+_CONTACTS_PREFETCH_PAGES = DEFAULT_CONCURRENCY
+
+# Lifetime requested for new Graph subscriptions
+_SUBSCRIPTION_TTL = timedelta(days=3)
+
+
+def _delta_token(delta_link: str) -> str | None:
+    """Return the $deltatoken parameter of a delta link, None if absent."""
+    # Scans the query like parse_qs without decoding every parameter
+    for param in delta_link.partition("?")[2].split("&"):
+        name, _, value = param.partition("=")
+        if name == "$deltatoken":
+            return unquote_plus(value) or None
+    return None
+
+
+class _BearerAuth(httpx.Auth):
+    """Attach a user's bearer token to requests on the shared client."""
+
+    def __init__(self, token: str) -> None:
+        self._authorization = f"Bearer {token}"
+
+    def auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        request.headers["Authorization"] = self._authorization
+        yield request
+
 
 class Microsoft365Integration(BaseIntegration):
     """Microsoft Graph API integration."""
 
-    GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
+    GRAPH_BASE_URL = GRAPH_BASE_URL
 
-    def __init__(self, access_token: str) -> None:
+    _EMAIL_CHANGE_TYPES = "created,updated"
+    _CALENDAR_CHANGE_TYPES = "created,updated,deleted"
+    _SUBSCRIPTION_TEMPLATE = MappingProxyType(
+        {"latestSupportedTlsVersion": "v1_2"}
+    )
+
+    def __init__(
+        self, access_token: str, client: httpx.AsyncClient | None = None
+    ) -> None:
         """
         Initialize Microsoft 365 integration.
 
         Args:
             access_token: OAuth access token
+            client: Optional HTTP client, defaults to the shared client
         """
         super().__init__(access_token)
-        self.headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-        }
+        self._auth = _BearerAuth(access_token)
+        self._client = client or get_graph_client()
+        self._batch_semaphore = asyncio.Semaphore(_GRAPH_BATCH_CONCURRENCY)
+
+    async def _request(
+        self, method: str, url: str, body: dict[str, Any] | None = None
+    ) -> Any:
+        """Send a Graph request with retries and decode its JSON response."""
+        return await call_with_retry(
+            functools.partial(self._send, method, url, body),
+            "microsoft_365",
+            functools.partial(
+                graph_retry_after, idempotent=is_idempotent(method, url, body)
+            ),
+            scope=self.rate_limit_scope,
+        )
+
+    async def _send(
+        self, method: str, url: str, body: dict[str, Any] | None
+    ) -> Any:
+        """Send a Graph request and decode its JSON response."""
+        response = await self._client.request(
+            method,
+            url,
+            auth=self._auth,
+            content=orjson.dumps(body) if body is not None else None,
+        )
+        response.raise_for_status()
+
+        return orjson.loads(response.content)
 
     async def get_contacts(
         self, sync_token: str | None = None
@@ -44,41 +143,29 @@ class Microsoft365Integration(BaseIntegration):
         """
         try:
             contacts = []
-            delta_link = None
 
             # Build initial URL
             if sync_token:
-                url = f"{self.GRAPH_BASE_URL}/me/contacts/delta?$deltatoken={sync_token}"
+                url = f"/me/contacts/delta?$deltatoken={sync_token}"
             else:
-                url = f"{self.GRAPH_BASE_URL}/me/contacts?$top=100"
-
-            async with httpx.AsyncClient() as client:
-                while url:
-                    response = await client.get(url, headers=self.headers)
-                    response.raise_for_status()
-                    data = response.json()
-
-                    # Process contacts
-                    for contact in data.get("value", []):
-                        contact_data = self._parse_microsoft_contact(contact)
-                        if contact_data:
-                            contacts.append(contact_data)
-
-                    # Check for next page or delta link
-                    url = data.get("@odata.nextLink")
-                    if not url:
-                        delta_link = data.get("@odata.deltaLink")
-                        break
+                url = f"/me/contacts?$top={_CONTACTS_PAGE_SIZE}"
 
-            # Extract delta token from delta link
-            next_sync_token = None
-            if delta_link:
-                # Parse delta token from URL
-                import urllib.parse
+            page, url, delta_link = await self._fetch_contacts_page(url)
+            contacts.extend(page)
 
-                parsed = urllib.parse.urlparse(delta_link)
-                params = urllib.parse.parse_qs(parsed.query)
-                next_sync_token = params.get("$deltatoken", [None])[0]
+            if url and not sync_token:
+                # Full listings page by offset, so the remaining pages can
+                # be requested without waiting for each next link
+                contacts.extend(await self._fetch_remaining_contact_pages())
+                url = None
+
+            # Delta pages are chained through opaque skip tokens
+            while url:
+                page, url, delta_link = await self._fetch_contacts_page(url)
+                contacts.extend(page)
+
+            # Extract delta token from delta link
+            next_sync_token = _delta_token(delta_link) if delta_link else None
 
             return contacts, next_sync_token
 
@@ -99,10 +186,69 @@ class Microsoft365Integration(BaseIntegration):
                 operation="get_contacts",
             )
 
+    @with_retry("microsoft_365", graph_retry_after, scope=instance_scope)
+    async def _fetch_contacts_page(
+        self, url: str
+    ) -> Tuple[list[dict[str, Any]], str | None, str | None]:
+        """Stream one page of contacts with its next and delta links."""
+        parser = ContactPageParser(self._parse_microsoft_contact)
+
+        async with self._client.stream("GET", url, auth=self._auth) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+        parser.close()
+
+        return (
+            parser.contacts,
+            parser.links.get("@odata.nextLink"),
+            parser.links.get("@odata.deltaLink"),
+        )
+
+    async def _fetch_remaining_contact_pages(self) -> list[dict[str, Any]]:
+        """Fetch every contact page after the first, several at a time."""
+        contacts = []
+        offset = _CONTACTS_PAGE_SIZE
+
+        while True:
+            urls = [
+                f"/me/contacts?$top={_CONTACTS_PAGE_SIZE}"
+                f"&$skip={offset + i * _CONTACTS_PAGE_SIZE}"
+                for i in range(_CONTACTS_PREFETCH_PAGES)
+            ]
+            pages = await asyncio.gather(
+                *(self._fetch_contacts_page(url) for url in urls),
+                return_exceptions=True,
+            )
+
+            # Pages past the end of the listing are ignored, even failed
+            for page in pages:
+                if isinstance(page, BaseException):
+                    raise page
+
+                page_contacts, next_link, _ = page
+                contacts.extend(page_contacts)
+                if not next_link:
+                    return contacts
+
+            offset += _CONTACTS_PREFETCH_PAGES * _CONTACTS_PAGE_SIZE
+
     def _parse_microsoft_contact(
         self, contact: dict[str, Any]
     ) -> dict[str, Any] | None:
         """Parse Microsoft contact data."""
+        emails = contact.get("emailAddresses")
+        mobile_phone = contact.get("mobilePhone")
+
+        # Skip contacts without any identifier before building anything
+        if not (
+            emails
+            or mobile_phone
+            or contact.get("businessPhones")
+            or contact.get("homePhones")
+        ):
+            return None
+
         contact_data = {
             "id": contact.get("id"),
             "name": contact.get("displayName"),
@@ -110,25 +256,19 @@ class Microsoft365Integration(BaseIntegration):
         }
 
         # Extract emails
-        for email in contact.get("emailAddresses", []):
+        for email in emails or ():
             if email.get("address"):
                 contact_data["identifiers"].append(
-                    {"type": "email", "value": email["address"]}
+                    Identifier("email", email["address"])
                 )
 
         # Extract phone numbers
-        for phone_type in ["businessPhones", "homePhones", "mobilePhone"]:
-            phones = contact.get(phone_type)
-            if isinstance(phones, list):
-                for phone in phones:
-                    if phone:
-                        contact_data["identifiers"].append(
-                            {"type": "phone", "value": phone}
-                        )
-            elif phones:  # mobilePhone is a string
-                contact_data["identifiers"].append(
-                    {"type": "phone", "value": phones}
-                )
+        for phone_type in ("businessPhones", "homePhones"):
+            for phone in contact.get(phone_type) or ():
+                if phone:
+                    contact_data["identifiers"].append(Identifier("phone", phone))
+        if mobile_phone:
+            contact_data["identifiers"].append(Identifier("phone", mobile_phone))
 
         # Only return if we have at least one identifier
         return contact_data if contact_data["identifiers"] else None
@@ -144,47 +284,11 @@ class Microsoft365Integration(BaseIntegration):
             Email data including body and metadata
         """
         try:
-            url = f"{self.GRAPH_BASE_URL}/me/messages/{email_id}"
+            url = f"/me/messages/{email_id}"
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                message = response.json()
+            message = await self._request("GET", url)
 
-            recepients = [
-                r.get("emailAddress", {}).get("address")
-                for r in message.get("toRecipients", [])
-            ]
-            recepients.extend(
-                [
-                    r.get("emailAddress", {}).get("address")
-                    for r in message.get("ccRecipients", [])
-                ]
-            )
-            recepients.extend(
-                [
-                    r.get("emailAddress", {}).get("address")
-                    for r in message.get("bccRecipients", [])
-                ]
-            )
-
-            return {
-                "id": message["id"],
-                "conversationId": message.get("conversationId"),
-                "from": message.get("from", {})
-                .get("emailAddress", {})
-                .get("address"),
-                "to": recepients,
-                "subject": message.get("subject"),
-                "date": message.get("receivedDateTime"),
-                "content": message.get("body", {}).get("content"),
-                "contentType": message.get("body", {}).get("contentType"),
-                # "contentPreview": message.get("bodyPreview"),
-                "importance": message.get("importance"),
-                "isDraft": message.get("isDraft"),
-                "isRead": message.get("isRead"),
-                "hasAttachments": message.get("hasAttachments"),
-            }
+            return self._parse_graph_message(message)
 
         except httpx.HTTPStatusError as e:
             logger.error(
@@ -203,6 +307,67 @@ class Microsoft365Integration(BaseIntegration):
                 operation="get_email_content",
             )
 
+    async def get_email_contents_bulk(
+        self, email_ids: list[str]
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch content of many emails using Graph JSON batching.
+
+        Args:
+            email_ids: Message IDs
+
+        Returns:
+            Email data for each message that could be fetched, in the
+            order of the given IDs
+        """
+        try:
+            responses = await self.get_many(
+                [
+                    {"method": "GET", "url": f"/me/messages/{email_id}"}
+                    for email_id in email_ids
+                ]
+            )
+            return [
+                self._parse_graph_message(response["body"])
+                for response in self._successful(responses, "email")
+            ]
+
+        except Exception as e:
+            logger.error(f"Failed to fetch emails: {str(e)}")
+            raise IntegrationException(
+                f"Failed to fetch emails: {str(e)}",
+                provider="microsoft_365",
+                operation="get_email_contents_bulk",
+            )
+
+    def _parse_graph_message(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Parse Microsoft Graph message data."""
+        body = message.get("body") or {}
+        sender = (message.get("from") or {}).get("emailAddress") or {}
+
+        recipients = [
+            address
+            for key in ("toRecipients", "ccRecipients", "bccRecipients")
+            for r in message.get(key) or ()
+            if (address := (r.get("emailAddress") or {}).get("address"))
+        ]
+
+        return {
+            "id": message["id"],
+            "conversationId": message.get("conversationId"),
+            "from": sender.get("address"),
+            "to": recipients,
+            "subject": message.get("subject"),
+            "date": message.get("receivedDateTime"),
+            "content": body.get("content"),
+            "contentType": body.get("contentType"),
+            # "contentPreview": message.get("bodyPreview"),
+            "importance": message.get("importance"),
+            "isDraft": message.get("isDraft"),
+            "isRead": message.get("isRead"),
+            "hasAttachments": message.get("hasAttachments"),
+        }
+
     async def get_calendar_event(self, event_id: str) -> dict[str, Any]:
         """
         Fetch calendar event from Microsoft Graph.
@@ -214,41 +379,11 @@ class Microsoft365Integration(BaseIntegration):
             Event data
         """
         try:
-            url = f"{self.GRAPH_BASE_URL}/me/events/{event_id}"
-
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                event = response.json()
-
-            return {
-                "id": event["id"],
-                "summary": event.get("subject"),
-                "description": event.get("body", {}).get("content"),
-                "location": event.get("location", {}).get("displayName"),
-                "start": event.get("start"),
-                "end": event.get("end"),
-                "attendees": [
-                    a.get("emailAddress", {}).get("address")
-                    for a in event.get("attendees", [])
-                ],
-                "organizer": event.get("organizer", {})
-                .get("emailAddress", {})
-                .get("address"),
-                "isOrganizer": event.get("isOrganizer"),
-                "content": event.get("body", {}).get("content"),
-                "contentType": event.get("body", {}).get("contentType"),
-                # "contentPreview": message.get("bodyPreview"),
-                "isAllDay": event.get("isAllDay"),
-                "isCancelled": event.get("isCancelled"),
-                "isRecurring": event.get("recurrence") is not None,
-                "isDraft": event.get("isDraft"),
-                "importance": event.get("importance"),
-                "sensitivity": event.get("sensitivity"),
-                "recurrence": event.get("recurrence"),
-                "isOnlineMeeting": event.get("isOnlineMeeting"),
-                "response": event.get("responseStatus", {}).get("response"),
-            }
+            url = f"/me/events/{event_id}"
+
+            event = await self._request("GET", url)
+
+            return self._parse_graph_event(event)
 
         except httpx.HTTPStatusError as e:
             logger.error(
@@ -267,6 +402,155 @@ class Microsoft365Integration(BaseIntegration):
                 operation="get_calendar_event",
             )
 
+    async def get_calendar_events_bulk(
+        self, event_ids: list[str]
+    ) -> list[dict[str, Any]]:
+        """
+        Fetch many calendar events using Graph JSON batching.
+
+        Args:
+            event_ids: Event IDs
+
+        Returns:
+            Event data for each event that could be fetched, in the
+            order of the given IDs
+        """
+        try:
+            responses = await self.get_many(
+                [
+                    {"method": "GET", "url": f"/me/events/{event_id}"}
+                    for event_id in event_ids
+                ]
+            )
+            return [
+                self._parse_graph_event(response["body"])
+                for response in self._successful(responses, "event")
+            ]
+
+        except Exception as e:
+            logger.error(f"Failed to fetch events: {str(e)}")
+            raise IntegrationException(
+                f"Failed to fetch events: {str(e)}",
+                provider="microsoft_365",
+                operation="get_calendar_events_bulk",
+            )
+
+    def _parse_graph_event(self, event: dict[str, Any]) -> dict[str, Any]:
+        """Parse Microsoft Graph event data."""
+        body = event.get("body") or {}
+        organizer = (event.get("organizer") or {}).get("emailAddress") or {}
+        recurrence = event.get("recurrence")
+
+        return {
+            "id": event["id"],
+            "summary": event.get("subject"),
+            "description": body.get("content"),
+            "location": (event.get("location") or {}).get("displayName"),
+            "start": event.get("start"),
+            "end": event.get("end"),
+            "attendees": [
+                (a.get("emailAddress") or {}).get("address")
+                for a in event.get("attendees") or ()
+            ],
+            "organizer": organizer.get("address"),
+            "isOrganizer": event.get("isOrganizer"),
+            "content": body.get("content"),
+            "contentType": body.get("contentType"),
+            # "contentPreview": message.get("bodyPreview"),
+            "isAllDay": event.get("isAllDay"),
+            "isCancelled": event.get("isCancelled"),
+            "isRecurring": recurrence is not None,
+            "isDraft": event.get("isDraft"),
+            "importance": event.get("importance"),
+            "sensitivity": event.get("sensitivity"),
+            "recurrence": recurrence,
+            "isOnlineMeeting": event.get("isOnlineMeeting"),
+            "response": (event.get("responseStatus") or {}).get("response"),
+        }
+
+    async def get_many(
+        self, requests: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Execute many Graph requests through the JSON batch endpoint.
+
+        Requests are sent in batches of 20, the most Graph accepts in a
+        single call, with at most 4 batches in flight at a time.
+
+        Args:
+            requests: Batch subrequests, each with at least "method" and
+                a "url" relative to the API version (e.g. "/me/events/1")
+
+        Returns:
+            Batch responses with "status", "headers" and "body", in the
+            order of the given requests
+        """
+        chunks = [
+            requests[start : start + _GRAPH_BATCH_SIZE]
+            for start in range(0, len(requests), _GRAPH_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(self._post_batch(chunk) for chunk in chunks)
+        )
+        return [response for chunk in results for response in chunk]
+
+    async def _post_batch(
+        self, requests: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Post a single JSON batch, resending transient failures."""
+        responses: dict[int, dict[str, Any]] = {}
+
+        async def send(pending: list[int]) -> dict[int, float]:
+            body = {
+                "requests": [
+                    {**requests[index], "id": str(index)} for index in pending
+                ]
+            }
+            async with self._batch_semaphore:
+                data = await self._request("POST", "/$batch", body)
+
+            throttled = {}
+            for response in data["responses"]:
+                index = int(response["id"])
+                responses[index] = response
+                request = requests[index]
+                delay = status_retry_after(
+                    response["status"],
+                    httpx.Headers(response.get("headers") or {}),
+                    is_idempotent(
+                        request["method"], request["url"], request.get("body")
+                    ),
+                )
+                if delay is not None:
+                    throttled[index] = delay
+            return throttled
+
+        await resend_transient(
+            send,
+            list(range(len(requests))),
+            "microsoft_365",
+            scope=self.rate_limit_scope,
+        )
+
+        # Graph may answer subrequests in any order
+        return [responses[index] for index in range(len(requests))]
+
+    def _successful(
+        self, responses: list[dict[str, Any]], kind: str
+    ) -> list[dict[str, Any]]:
+        """Drop and log failed batch responses."""
+        successful = []
+        for response in responses:
+            if response["status"] < 400:
+                successful.append(response)
+            else:
+                error = response.get("body", {}).get("error", {})
+                logger.warning(
+                    f"Failed to fetch {kind} in batch: "
+                    f"HTTP {response['status']} {error.get('code')}"
+                )
+        return successful
+
     async def subscribe_to_realtime_events(
         self, user_id: str, notification_url: str
     ) -> dict[str, Any]:
@@ -288,31 +572,31 @@ class Microsoft365Integration(BaseIntegration):
 
             # Calculate expiration (max 3 days for messages)
             expiration = (
-                datetime.utcnow() + timedelta(days=3)
-            ).isoformat() + "Z"
+                (datetime.now(UTC) + _SUBSCRIPTION_TTL)
+                .replace(microsecond=0)
+                .isoformat()
+                .replace("+00:00", "Z")
+            )
 
-            async with httpx.AsyncClient() as client:
-                # Subscribe to email messages
-                email_sub = await self._create_subscription(
-                    client,
+            # Subscribe to email messages and calendar events
+            email_sub, calendar_sub = await asyncio.gather(
+                self._create_subscription(
                     resource="/me/messages",
-                    change_types=["created", "updated"],
+                    change_type=self._EMAIL_CHANGE_TYPES,
                     notification_url=notification_url,
                     client_state=client_state,
                     expiration=expiration,
-                )
-                subscriptions["email"] = email_sub
-
-                # Subscribe to calendar events
-                calendar_sub = await self._create_subscription(
-                    client,
+                ),
+                self._create_subscription(
                     resource="/me/events",
-                    change_types=["created", "updated", "deleted"],
+                    change_type=self._CALENDAR_CHANGE_TYPES,
                     notification_url=notification_url,
                     client_state=client_state,
                     expiration=expiration,
-                )
-                subscriptions["calendar"] = calendar_sub
+                ),
+            )
+            subscriptions["email"] = email_sub
+            subscriptions["calendar"] = calendar_sub
 
             return subscriptions
 
@@ -326,29 +610,25 @@ class Microsoft365Integration(BaseIntegration):
 
     async def _create_subscription(
         self,
-        client: httpx.AsyncClient,
         resource: str,
-        change_types: list[str],
+        change_type: str,
         notification_url: str,
         client_state: str,
         expiration: str,
     ) -> dict[str, Any]:
         """Create a single Microsoft Graph subscription."""
-        url = f"{self.GRAPH_BASE_URL}/subscriptions"
+        url = "/subscriptions"
 
         body = {
-            "changeType": ",".join(change_types),
+            **self._SUBSCRIPTION_TEMPLATE,
+            "changeType": change_type,
             "notificationUrl": notification_url,
             "resource": resource,
             "expirationDateTime": expiration,
             "clientState": client_state,
-            "latestSupportedTlsVersion": "v1_2",
         }
 
-        response = await client.post(url, headers=self.headers, json=body)
-        response.raise_for_status()
-
-        subscription = response.json()
+        subscription = await self._request("POST", url, body)
 
         # Store client state for validation
         # This would be stored in the database
@@ -373,17 +653,11 @@ class Microsoft365Integration(BaseIntegration):
             Updated subscription information
         """
         try:
-            url = f"{self.GRAPH_BASE_URL}/subscriptions/{subscription_id}"
+            url = f"/subscriptions/{subscription_id}"
 
             body = {"expirationDateTime": expiration_date}
 
-            async with httpx.AsyncClient() as client:
-                response = await client.patch(
-                    url, headers=self.headers, json=body
-                )
-                response.raise_for_status()
-
-                return response.json()
+            return await self._request("PATCH", url, body)
 
         except Exception as e:
             logger.error(f"Failed to renew subscription: {str(e)}")
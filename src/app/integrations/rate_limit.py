@@ -0,0 +1,355 @@
+"""Adaptive rate limiting and retries for provider API calls."""
+
+import asyncio
+import functools
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, ParamSpec, TypeVar
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+# Classifies a failed call: None when the error is permanent, otherwise
+# the server-requested delay in seconds (0.0 when none was given)
+RetryClassifier = Callable[[Exception], float | None]
+
+# Concurrent calls allowed per user until the limit adapts
+DEFAULT_CONCURRENCY = 4
+
+# Scope count at which idle scopes are first swept from the limiter
+_MIN_SWEEP_SIZE = 1024
+
+
+def parse_retry_after(value: str | None) -> float:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Header value, either delay seconds or an HTTP date
+
+    Returns:
+        Delay in seconds, 0.0 when missing or unparseable
+    """
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    # HTTP dates are always UTC, but a "-0000" zone parses as naive
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+@dataclass
+class _ScopeState:
+    """Rate limiting state for a single user of a provider."""
+
+    limit: int
+    in_flight: int = 0
+    waiting: int = 0
+    backoff: int = 0
+    blocked_until: float = 0.0
+    successful_request_intervals: int = 0
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+class RateLimiter:
+    """
+    Adaptive per-user concurrency limit with exponential backoff.
+
+    Providers throttle each user or mailbox separately, so state is kept
+    per provider and scope, where the scope identifies the user. Throttled
+    calls halve the scope's concurrency limit and pause its new calls for
+    the Retry-After delay, or an exponentially growing delay when the
+    server gives none. Each run of successful calls raises the limit by
+    one again, so steady-state traffic rides close to the quota. State of
+    idle scopes is dropped, so memory is bounded by the active users.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = DEFAULT_CONCURRENCY,
+        max_concurrency: int = 16,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        increase_after: int = 20,
+    ) -> None:
+        """
+        Initialize rate limiter.
+
+        Args:
+            initial_concurrency: Concurrent calls allowed per scope
+            max_concurrency: Upper bound for the adaptive limit
+            base_delay: First backoff delay in seconds
+            max_delay: Largest backoff delay in seconds
+            increase_after: Successful calls needed to raise the limit
+        """
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.increase_after = increase_after
+        self._scopes: dict[tuple[str, str | None], _ScopeState] = {}
+        self._sweep_at = _MIN_SWEEP_SIZE
+
+    def _state(self, provider: str, scope: str | None) -> _ScopeState:
+        """Return the state for a scope, creating it on first use."""
+        state = self._scopes.get((provider, scope))
+        if state is None:
+            if len(self._scopes) >= self._sweep_at:
+                self._sweep()
+            state = _ScopeState(limit=self.initial_concurrency)
+            self._scopes[(provider, scope)] = state
+        return state
+
+    def _is_idle(self, state: _ScopeState) -> bool:
+        """Whether a scope has no calls and no pending backoff delay."""
+        return (
+            state.in_flight == 0
+            and state.waiting == 0
+            and state.blocked_until <= time.monotonic()
+        )
+
+    def _release(self, provider: str, scope: str | None) -> None:
+        """Drop the state of a scope once it is idle."""
+        state = self._scopes.get((provider, scope))
+        if state is not None and self._is_idle(state):
+            del self._scopes[(provider, scope)]
+
+    def _sweep(self) -> None:
+        """Drop idle scopes that were still backing off when released."""
+        self._scopes = {
+            key: state
+            for key, state in self._scopes.items()
+            if not self._is_idle(state)
+        }
+        self._sweep_at = max(_MIN_SWEEP_SIZE, 2 * len(self._scopes))
+
+    @asynccontextmanager
+    async def slot(
+        self, provider: str, scope: str | None = None
+    ) -> AsyncIterator[None]:
+        """Wait for backoff and a free concurrency slot, then hold it."""
+        state = self._state(provider, scope)
+        state.waiting += 1
+        try:
+            async with state.condition:
+                await state.condition.wait_for(
+                    lambda: state.in_flight < state.limit
+                )
+                state.in_flight += 1
+        finally:
+            state.waiting -= 1
+        try:
+            delay = state.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            async with state.condition:
+                state.in_flight -= 1
+                state.condition.notify(state.limit - state.in_flight)
+            self._release(provider, scope)
+
+    def record_success(self, provider: str, scope: str | None = None) -> None:
+        """Reset backoff and grow the limit after enough successes."""
+        state = self._state(provider, scope)
+        state.backoff = 0
+        state.successful_request_intervals += 1
+        if (
+            state.successful_request_intervals >= self.increase_after
+            and state.limit < self.max_concurrency
+        ):
+            state.limit += 1
+            state.successful_request_intervals = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Return the exponential backoff delay before retry number attempt + 1."""
+        return min(self.max_delay, self.base_delay * 2**attempt)
+
+    def record_throttle(
+        self, provider: str, retry_after: float, scope: str | None = None
+    ) -> float:
+        """
+        Back off after a transient failure.
+
+        Args:
+            provider: Provider name
+            retry_after: Server-requested delay, 0.0 if none
+            scope: User the failed call was made for
+
+        Returns:
+            Delay in seconds before the scope accepts new calls
+        """
+        state = self._state(provider, scope)
+        state.backoff += 1
+        state.successful_request_intervals = 0
+        state.limit = max(1, state.limit // 2)
+
+        delay = retry_after or self.backoff_delay(state.backoff - 1)
+        delay *= 1 + random.random() * 0.1
+        state.blocked_until = max(
+            state.blocked_until, time.monotonic() + delay
+        )
+        return delay
+
+
+rate_limiter = RateLimiter()
+
+
+def instance_scope(instance: Any, *args: Any, **kwargs: Any) -> str | None:
+    """Rate limit scope of a method call, taken from its instance."""
+    return instance.rate_limit_scope
+
+
+# Retries before the last transient error of a call is re-raised
+MAX_RETRIES = 5
+
+
+async def call_with_retry(
+    call: Callable[[], Awaitable[T]],
+    provider: str,
+    classify: RetryClassifier,
+    scope: str | None = None,
+    max_retries: int = MAX_RETRIES,
+    limiter: RateLimiter | None = None,
+) -> T:
+    """
+    Run an async provider call, retrying it on transient errors.
+
+    Args:
+        call: Makes the call, invoked once per attempt
+        provider: Provider name the call is rate limited under
+        classify: Tells transient errors from permanent ones
+        scope: User the call is rate limited under
+        max_retries: Retries before the last error is re-raised
+        limiter: Rate limiter to use, defaults to the shared one
+
+    Returns:
+        Result of the first successful attempt
+    """
+    limiter = limiter or rate_limiter
+    # Calls are usually partials of the provider method
+    name = getattr(call, "func", call).__name__
+    attempt = 0
+    while True:
+        async with limiter.slot(provider, scope):
+            try:
+                result = await call()
+            except Exception as e:
+                retry_after = classify(e)
+                if retry_after is None or attempt >= max_retries:
+                    raise
+                delay = limiter.record_throttle(provider, retry_after, scope)
+                attempt += 1
+                logger.warning(
+                    f"Transient {provider} error in {name}, "
+                    f"retry {attempt}/{max_retries} in {delay:.1f}s: "
+                    f"{str(e)}"
+                )
+            else:
+                limiter.record_success(provider, scope)
+                return result
+
+
+def with_retry(
+    provider: str,
+    classify: RetryClassifier,
+    max_retries: int = MAX_RETRIES,
+    limiter: RateLimiter | None = None,
+    scope: Callable[..., str | None] | None = None,
+) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+    """
+    Retry an async provider call on transient errors.
+
+    Args:
+        provider: Provider name the call is rate limited under
+        classify: Tells transient errors from permanent ones
+        max_retries: Retries before the last error is re-raised
+        limiter: Rate limiter to use, defaults to the shared one
+        scope: Derives the rate limit scope from the call's arguments,
+            e.g. instance_scope for integration methods
+
+    Returns:
+        Decorator for the async call
+    """
+
+    def decorator(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            return await call_with_retry(
+                functools.partial(func, *args, **kwargs),
+                provider,
+                classify,
+                scope=scope(*args, **kwargs) if scope else None,
+                max_retries=max_retries,
+                limiter=limiter,
+            )
+
+        return wrapper
+
+    return decorator
+
+
+async def resend_transient(
+    send: Callable[[list[K]], Awaitable[dict[K, float]]],
+    keys: list[K],
+    provider: str,
+    scope: str | None = None,
+    max_retries: int = MAX_RETRIES,
+    limiter: RateLimiter | None = None,
+) -> dict[K, float]:
+    """
+    Send a batch of calls, resending the ones that fail transiently.
+
+    Providers throttle the calls in a batch individually, so a batch can
+    succeed while some of its calls are rejected. Those calls are sent
+    again once the rate limiter lets the scope through.
+
+    Args:
+        send: Sends one batch for the given keys and returns the
+            server-requested delay (0.0 if none) of each key that failed
+            transiently
+        keys: Keys of the calls to send
+        provider: Provider name the calls are rate limited under
+        scope: User the calls are rate limited under
+        max_retries: Resends before transient failures are given up on
+        limiter: Rate limiter to use, defaults to the shared one
+
+    Returns:
+        Keys still failing transiently after the last resend, with their
+        requested delays
+    """
+    limiter = limiter or rate_limiter
+    pending = keys
+    attempt = 0
+    while True:
+        throttled = await send(pending)
+        if not throttled or attempt >= max_retries:
+            return throttled
+
+        # The batch call itself succeeded and reset the limiter's backoff,
+        # so the delay grows with this loop's own attempts
+        retry_after = max(throttled.values()) or limiter.backoff_delay(attempt)
+        delay = limiter.record_throttle(provider, retry_after, scope)
+        attempt += 1
+        logger.warning(
+            f"{len(throttled)} {provider} batch calls failed transiently, "
+            f"retry {attempt}/{max_retries} in {delay:.1f}s"
+        )
+        pending = list(throttled)
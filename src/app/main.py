@@ -1,8 +1,39 @@
-from fastapi import FastAPI
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="Apex Ingestion Platform")
+import orjson
+from fastapi import FastAPI, Response
+from prometheus_client import make_asgi_app
+
+from app.integrations.graph_client import close_graph_client, get_graph_client
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One pooled Graph client and one set of loaded discovery documents
+    # per process, shared by every request
+    app.state.http = get_graph_client()
+    try:
+        from app.integrations.google_api import warm_discovery_cache
+    except ImportError as e:
+        logger.warning(f"Google integration unavailable: {str(e)}")
+    else:
+        warm_discovery_cache()
+    yield
+    await close_graph_client()
+
+
+app = FastAPI(title="Apex Ingestion Platform", lifespan=lifespan)
+app.mount("/metrics", make_asgi_app())
+
+# Serialized once; middleware may edit response headers in place, so
+# only the body is shared between requests
+_HEALTH_BODY = orjson.dumps({"status": "live-reload is working perfectly!"})
 
 
 @app.get("/health", tags=["Monitoring"])
-def health_check():
-    return {"status": "live-reload is working perfectly!"}
+async def health_check() -> Response:
+    return Response(_HEALTH_BODY, media_type="application/json")
@@ -0,0 +1,29 @@
+import importlib
+import secrets
+import sys
+import types
+
+
+def _stub_if_missing(name: str, **attributes) -> None:
+    """Register a stand-in for an app module this checkout does not ship."""
+    try:
+        importlib.import_module(name)
+    except ModuleNotFoundError:
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+_stub_if_missing(
+    "app.config",
+    settings=types.SimpleNamespace(
+        GOOGLE_CLIENT_ID="client-id",
+        GOOGLE_CLIENT_SECRET="client-secret",
+        GCP_PROJECT_ID="project",
+        PUBSUB_TOPIC="topic",
+    ),
+)
+_stub_if_missing("app.core")
+_stub_if_missing(
+    "app.core.security", generate_client_state=lambda: secrets.token_urlsafe(32)
+)
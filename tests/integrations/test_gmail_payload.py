@@ -0,0 +1,100 @@
+from base64 import urlsafe_b64encode
+
+from app.integrations.gmail_payload import walk_payload
+
+
+def _data(text: str | bytes) -> str:
+    raw = text.encode() if isinstance(text, str) else text
+    return urlsafe_b64encode(raw).decode()
+
+
+def _part(mime_type: str, text: str = "", filename: str = "", **extra):
+    return {
+        "mimeType": mime_type,
+        "filename": filename,
+        "body": {"data": _data(text)} if text else {"size": 0},
+        **extra,
+    }
+
+
+def test_single_part_message():
+    payload = _part("text/plain", "Hello")
+
+    assert walk_payload(payload) == ("Hello", False)
+
+
+def test_single_part_message_without_body():
+    assert walk_payload({"mimeType": "text/plain", "body": {"size": 0}}) == (
+        "",
+        False,
+    )
+
+
+def test_nested_multipart_keeps_document_order():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            {
+                "mimeType": "multipart/alternative",
+                "filename": "",
+                "parts": [
+                    _part("text/plain", "first "),
+                    _part("text/html", "<p>first</p>"),
+                ],
+            },
+            {
+                "mimeType": "multipart/related",
+                "filename": "",
+                "parts": [
+                    {
+                        "mimeType": "multipart/alternative",
+                        "filename": "",
+                        "parts": [_part("text/plain", "second")],
+                    }
+                ],
+            },
+        ],
+    }
+
+    assert walk_payload(payload) == ("first second", False)
+
+
+def test_attachments_are_flagged_and_not_read_as_body():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [
+            _part("text/plain", "Body"),
+            _part("text/plain", "notes.txt content", filename="notes.txt"),
+            {
+                "mimeType": "message/rfc822",
+                "filename": "forwarded.eml",
+                "parts": [_part("text/plain", "forwarded")],
+            },
+        ],
+    }
+
+    assert walk_payload(payload) == ("Body", True)
+
+
+def test_blank_filename_is_not_an_attachment():
+    payload = {
+        "mimeType": "multipart/mixed",
+        "parts": [_part("text/plain", "Body", filename="  ")],
+    }
+
+    assert walk_payload(payload) == ("Body", False)
+
+
+def test_invalid_utf8_is_replaced():
+    payload = {
+        "mimeType": "multipart/alternative",
+        "parts": [
+            {
+                "mimeType": "text/plain",
+                "filename": "",
+                "body": {"data": _data(b"caf\xe9")},
+            }
+        ],
+    }
+
+    assert walk_payload(payload) == ("caf�", False)
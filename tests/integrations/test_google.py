@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from app.integrations import google  # noqa: E402
+from app.integrations.google import GoogleWorkspaceIntegration  # noqa: E402
+
+
+class _BlockingRequest:
+    """Request whose execute blocks its worker thread until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.finished = False
+
+    def execute(self):
+        self.started.set()
+        self.release.wait(5)
+        self.finished = True
+        return {}
+
+
+def test_cancelled_call_holds_lock_until_thread_finishes():
+    integration = GoogleWorkspaceIntegration("token")
+    request = _BlockingRequest()
+
+    async def run():
+        call = asyncio.create_task(integration._execute_once(lambda: request))
+        await asyncio.to_thread(request.started.wait, 5)
+
+        call.cancel()
+        await asyncio.sleep(0.01)
+        call.cancel()
+        await asyncio.sleep(0.01)
+        assert integration._http_lock.locked()
+
+        request.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert request.finished
+        assert not integration._http_lock.locked()
+
+    asyncio.run(run())
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@pytest.mark.parametrize(
+    ("lifetime", "reused"),
+    [(timedelta(hours=1), True), (timedelta(seconds=30), False)],
+)
+def test_refreshed_token_is_reused_until_google_auth_would_refresh(
+    monkeypatch, lifetime, reused
+):
+    monkeypatch.setattr(google, "_token_cache", OrderedDict())
+    google._cache_token(
+        google.token_fingerprint("refresh"), "cached", _utcnow() + lifetime
+    )
+
+    integration = GoogleWorkspaceIntegration(
+        "given", refresh_token="refresh", token_expiry=_utcnow()
+    )
+
+    assert (integration.access_token == "cached") is reused
+    assert integration.credentials.expired is not reused
+
+
+def test_requests_are_built_in_the_worker_thread():
+    integration = GoogleWorkspaceIntegration("token")
+    request = _BlockingRequest()
+    request.release.set()
+    build_threads = []
+
+    def build_request():
+        build_threads.append(threading.get_ident())
+        return request
+
+    result = asyncio.run(integration._execute(build_request, idempotent=True))
+
+    assert result == {}
+    assert build_threads and threading.get_ident() not in build_threads
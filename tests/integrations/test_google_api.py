@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import httplib2  # noqa: E402
+from googleapiclient.errors import BatchError, HttpError  # noqa: E402
+
+from app.integrations.google_api import (  # noqa: E402
+    discovery_document,
+    google_retry_after,
+    warm_discovery_cache,
+)
+
+
+def _http_error(status: int, headers: dict[str, str] | None = None, reasons=()):
+    response = httplib2.Response({"status": status, **(headers or {})})
+    content = json.dumps(
+        {"error": {"code": status, "errors": [{"reason": r} for r in reasons]}}
+    ).encode()
+    return HttpError(response, content)
+
+
+@pytest.mark.parametrize(
+    ("error", "idempotent", "expected"),
+    [
+        (_http_error(429, {"retry-after": "9"}), True, 9.0),
+        (_http_error(429), False, 0.0),
+        (_http_error(503), False, 0.0),
+        (_http_error(500), True, 0.0),
+        (_http_error(500), False, None),
+        (_http_error(403, reasons=["userRateLimitExceeded"]), True, 0.0),
+        (_http_error(403, reasons=["rateLimitExceeded"]), False, 0.0),
+        (_http_error(403, reasons=["insufficientPermissions"]), True, None),
+        (_http_error(404), True, None),
+        (_http_error(410), True, None),
+        (BatchError("invalid batch response"), True, None),
+        (ConnectionRefusedError(), False, 0.0),
+        (httplib2.ServerNotFoundError("no dns"), False, 0.0),
+        (ConnectionResetError(), True, 0.0),
+        (ConnectionResetError(), False, None),
+        (TimeoutError(), False, None),
+        (ValueError("bad json"), True, None),
+    ],
+)
+def test_google_retry_after(error, idempotent, expected):
+    assert google_retry_after(error, idempotent=idempotent) == expected
+
+
+def test_google_retry_after_unparseable_403():
+    error = HttpError(httplib2.Response({"status": 403}), b"<html>Forbidden</html>")
+
+    assert google_retry_after(error) is None
+
+
+def test_discovery_documents_are_loaded_once():
+    warm_discovery_cache()
+    hits = discovery_document.cache_info().hits
+
+    document = discovery_document("gmail", "v1")
+
+    assert json.loads(document)["name"] == "gmail"
+    assert discovery_document.cache_info().hits == hits + 1
+
+
+def test_discovery_document_must_be_bundled():
+    with pytest.raises(ValueError):
+        discovery_document("no-such-api", "v0")
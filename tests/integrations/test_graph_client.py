@@ -0,0 +1,116 @@
+import json
+
+import httpx
+import pytest
+
+from app.integrations.graph_client import (
+    ContactPageParser,
+    graph_retry_after,
+    is_idempotent,
+)
+
+
+def _status_error(status: int, headers: dict[str, str] | None = None):
+    request = httpx.Request("GET", "https://graph.microsoft.com/v1.0/me")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+@pytest.mark.parametrize(
+    ("error", "idempotent", "expected"),
+    [
+        (_status_error(429, {"Retry-After": "12"}), True, 12.0),
+        (_status_error(429), False, 0.0),
+        (_status_error(503, {"Retry-After": "3"}), False, 3.0),
+        (_status_error(500), True, 0.0),
+        (_status_error(504), True, 0.0),
+        (_status_error(500), False, None),
+        (_status_error(404), True, None),
+        (_status_error(401), True, None),
+        (httpx.ConnectError("refused"), False, 0.0),
+        (httpx.PoolTimeout("pool"), False, 0.0),
+        (httpx.ReadTimeout("read"), True, 0.0),
+        (httpx.ReadTimeout("read"), False, None),
+        (ValueError("bad json"), True, None),
+    ],
+)
+def test_graph_retry_after(error, idempotent, expected):
+    assert graph_retry_after(error, idempotent=idempotent) == expected
+
+
+@pytest.mark.parametrize(
+    ("method", "url", "body", "expected"),
+    [
+        ("GET", "/me/messages/1", None, True),
+        ("POST", "/subscriptions", {}, False),
+        ("PATCH", "/subscriptions/1", {}, False),
+        (
+            "POST",
+            "/$batch",
+            {"requests": [{"method": "GET"}, {"method": "GET"}]},
+            True,
+        ),
+        (
+            "POST",
+            "/$batch",
+            {"requests": [{"method": "GET"}, {"method": "DELETE"}]},
+            False,
+        ),
+    ],
+)
+def test_is_idempotent(method, url, body, expected):
+    assert is_idempotent(method, url, body) is expected
+
+
+_PAGE = json.dumps(
+    {
+        "@odata.context": "https://graph.microsoft.com/v1.0/$metadata#contacts",
+        "value": [
+            {
+                "id": "1",
+                "displayName": "Ada",
+                "emailAddresses": [{"name": "Ada", "address": "ada@example.com"}],
+                "businessPhones": ["+1 555 0100"],
+            },
+            {"id": "2", "displayName": "No identifiers", "emailAddresses": []},
+            {"id": "3", "displayName": "Grace", "value": {"nested": [1, 2.5]}},
+        ],
+        "@odata.nextLink": "https://graph.microsoft.com/v1.0/me/contacts?$skip=3",
+    }
+).encode()
+
+
+def _parse_contact(contact):
+    return contact if contact["id"] != "2" else None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, len(_PAGE)])
+def test_contact_page_parser_across_chunk_boundaries(chunk_size):
+    parser = ContactPageParser(_parse_contact)
+
+    for start in range(0, len(_PAGE), chunk_size):
+        parser.feed(_PAGE[start : start + chunk_size])
+    parser.close()
+
+    assert parser.contacts == [
+        json.loads(_PAGE)["value"][0],
+        json.loads(_PAGE)["value"][2],
+    ]
+    assert parser.links == {
+        "@odata.nextLink": "https://graph.microsoft.com/v1.0/me/contacts?$skip=3"
+    }
+
+
+def test_contact_page_parser_collects_delta_link_before_value():
+    body = (
+        b'{"@odata.deltaLink": "https://graph.microsoft.com/v1.0/me/contacts/'
+        b'delta?$deltatoken=abc", "value": []}'
+    )
+    parser = ContactPageParser(_parse_contact)
+
+    parser.feed(body[:30])
+    parser.feed(body[30:])
+    parser.close()
+
+    assert parser.contacts == []
+    assert parser.links["@odata.deltaLink"].endswith("$deltatoken=abc")
@@ -0,0 +1,226 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.integrations import rate_limit
+from app.integrations.base import IntegrationException
+from app.integrations.microsoft import Microsoft365Integration
+from app.integrations.rate_limit import DEFAULT_CONCURRENCY, RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    # Enough per-user concurrency to observe the integration's own bounds
+    limiter = RateLimiter(initial_concurrency=16, base_delay=0.001)
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+    return limiter
+
+
+def _integration(handler) -> Microsoft365Integration:
+    client = httpx.AsyncClient(
+        base_url="https://graph.test/v1.0", transport=httpx.MockTransport(handler)
+    )
+    return Microsoft365Integration("token", client=client)
+
+
+def _ok(request: dict) -> dict:
+    return {"id": request["id"], "status": 200, "body": {"url": request["url"]}}
+
+
+def _batch_handler(respond):
+    """Answer each $batch call with respond(subrequests), recording them."""
+    batches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v1.0/$batch"
+        subrequests = json.loads(request.content)["requests"]
+        batches.append(subrequests)
+        return httpx.Response(200, json={"responses": respond(subrequests)})
+
+    return handler, batches
+
+
+def _requests(count: int) -> list[dict]:
+    return [{"method": "GET", "url": f"/me/messages/{i}"} for i in range(count)]
+
+
+def test_get_many_sends_batches_of_twenty():
+    handler, batches = _batch_handler(lambda reqs: [_ok(r) for r in reqs])
+
+    responses = asyncio.run(_integration(handler).get_many(_requests(45)))
+
+    assert sorted(len(batch) for batch in batches) == [5, 20, 20]
+    assert [r["body"]["url"] for r in responses] == [
+        f"/me/messages/{i}" for i in range(45)
+    ]
+
+
+def test_get_many_reorders_responses():
+    handler, _ = _batch_handler(lambda reqs: [_ok(r) for r in reversed(reqs)])
+
+    responses = asyncio.run(_integration(handler).get_many(_requests(20)))
+
+    assert [r["body"]["url"] for r in responses] == [
+        f"/me/messages/{i}" for i in range(20)
+    ]
+
+
+def test_get_many_resends_only_transient_failures():
+    throttled_once = set()
+
+    def respond(reqs):
+        responses = []
+        for r in reqs:
+            if r["url"] == "/me/messages/3" and r["id"] not in throttled_once:
+                throttled_once.add(r["id"])
+                responses.append(
+                    {"id": r["id"], "status": 429, "headers": {"Retry-After": "0"}}
+                )
+            elif r["url"] == "/me/messages/5":
+                responses.append({"id": r["id"], "status": 404, "body": {}})
+            else:
+                responses.append(_ok(r))
+        return responses
+
+    handler, batches = _batch_handler(respond)
+
+    responses = asyncio.run(_integration(handler).get_many(_requests(8)))
+
+    assert [[r["url"] for r in batch] for batch in batches[1:]] == [
+        ["/me/messages/3"]
+    ]
+    assert [r["status"] for r in responses] == [200] * 5 + [404] + [200] * 2
+
+
+def test_get_email_contents_bulk_drops_failed_messages():
+    def respond(reqs):
+        return [
+            (
+                {"id": r["id"], "status": 404, "body": {"error": {"code": "x"}}}
+                if r["url"] == "/me/messages/1"
+                else {"id": r["id"], "status": 200, "body": {"id": r["url"][13:]}}
+            )
+            for r in reqs
+        ]
+
+    handler, _ = _batch_handler(respond)
+
+    emails = asyncio.run(
+        _integration(handler).get_email_contents_bulk(["0", "1", "2"])
+    )
+
+    assert [email["id"] for email in emails] == ["0", "2"]
+
+
+def test_get_many_bounds_batches_in_flight():
+    in_flight = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        subrequests = json.loads(request.content)["requests"]
+        return httpx.Response(
+            200, json={"responses": [_ok(r) for r in subrequests]}
+        )
+
+    responses = asyncio.run(_integration(handler).get_many(_requests(200)))
+
+    assert len(responses) == 200
+    assert peak == 4
+
+
+def _contacts_handler(total: int, failing_skip: int | None = None):
+    """Serve a contact listing of the given size, paged by $skip."""
+    skips = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/v1.0/me/contacts"
+        top = int(request.url.params["$top"])
+        skip = int(request.url.params.get("$skip", 0))
+        skips.append(skip)
+        if skip == failing_skip:
+            return httpx.Response(403)
+
+        page = {
+            "value": [
+                {"id": str(i), "emailAddresses": [{"address": f"{i}@test"}]}
+                for i in range(skip, min(skip + top, total))
+            ]
+        }
+        if skip + top < total:
+            page["@odata.nextLink"] = (
+                f"https://graph.test/v1.0/me/contacts?$top={top}&$skip={skip + top}"
+            )
+        return httpx.Response(200, json=page)
+
+    return handler, skips
+
+
+@pytest.mark.parametrize("total", [50, 100, 250, 300, 400, 401, 1000])
+def test_get_contacts_prefetches_pages_by_offset(total):
+    handler, skips = _contacts_handler(total)
+
+    contacts, sync_token = asyncio.run(_integration(handler).get_contacts())
+
+    assert [contact["id"] for contact in contacts] == [
+        str(i) for i in range(total)
+    ]
+    assert sync_token is None
+    pages = max(1, -(-total // 100))
+    # Only the last round of prefetched pages reaches past the end
+    assert len(skips) - pages < DEFAULT_CONCURRENCY
+    assert sorted(skips) == [i * 100 for i in range(len(skips))]
+
+
+def test_get_contacts_raises_on_failed_page_before_the_end():
+    handler, _ = _contacts_handler(500, failing_skip=200)
+
+    with pytest.raises(IntegrationException):
+        asyncio.run(_integration(handler).get_contacts())
+
+
+def test_get_contacts_ignores_failed_page_past_the_end():
+    handler, _ = _contacts_handler(250, failing_skip=300)
+
+    contacts, _ = asyncio.run(_integration(handler).get_contacts())
+
+    assert len(contacts) == 250
+
+
+@pytest.mark.parametrize(
+    ("delta_link", "expected"),
+    [
+        ("/me/contacts/delta?$deltatoken=abc", "abc"),
+        ("/me/contacts/delta?$deltatoken=abc&$select=id", "abc"),
+        ("/me/contacts/delta?$select=id&$deltatoken=abc", "abc"),
+        ("/me/contacts/delta?$deltatoken=a%2Bb%3D%3D", "a+b=="),
+        ("/me/contacts/delta?$deltatoken=a+b", "a b"),
+        ("/me/contacts/delta?$deltatoken=", None),
+        ("/me/contacts/delta?$skiptoken=abc", None),
+    ],
+)
+def test_get_contacts_extracts_delta_token(delta_link, expected):
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url)
+        return httpx.Response(
+            200,
+            json={
+                "value": [],
+                "@odata.deltaLink": f"https://graph.test/v1.0{delta_link}",
+            },
+        )
+
+    contacts, sync_token = asyncio.run(
+        _integration(handler).get_contacts(sync_token="previous")
+    )
+
+    assert contacts == []
+    assert sync_token == expected
+    assert requested[0].params["$deltatoken"] == "previous"
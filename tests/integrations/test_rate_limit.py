@@ -0,0 +1,262 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+
+from app.integrations.rate_limit import (
+    RateLimiter,
+    call_with_retry,
+    instance_scope,
+    parse_retry_after,
+    resend_transient,
+    with_retry,
+)
+
+
+def _transient(error: Exception) -> float | None:
+    return 0.0 if isinstance(error, ConnectionError) else None
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(None, 0.0), ("", 0.0), ("7", 7.0), ("1.5", 1.5), ("-3", 0.0), ("soon", 0.0)],
+)
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+@pytest.mark.parametrize("usegmt", [True, False])
+def test_parse_retry_after_http_date(usegmt):
+    retry_at = datetime.now(UTC) + timedelta(seconds=30)
+    # Without usegmt the zone is written as "-0000", which parses as naive
+    value = format_datetime(
+        retry_at if usegmt else retry_at.replace(tzinfo=None), usegmt=usegmt
+    )
+    assert 25 < parse_retry_after(value) <= 30
+
+
+def test_parse_retry_after_past_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_throttle_halves_limit_down_to_one():
+    limiter = RateLimiter(initial_concurrency=8)
+
+    limits = []
+    for _ in range(4):
+        limiter.record_throttle("p", 0.0)
+        limits.append(limiter._state("p", None).limit)
+
+    assert limits == [4, 2, 1, 1]
+
+
+def test_successes_grow_limit_again():
+    limiter = RateLimiter(initial_concurrency=8, increase_after=3)
+    limiter.record_throttle("p", 0.0)
+
+    for _ in range(6):
+        limiter.record_success("p")
+
+    state = limiter._state("p", None)
+    assert state.limit == 6
+    assert state.backoff == 0
+
+
+def test_successes_stop_at_max_concurrency():
+    limiter = RateLimiter(initial_concurrency=2, max_concurrency=3, increase_after=1)
+
+    for _ in range(5):
+        limiter.record_success("p")
+
+    assert limiter._state("p", None).limit == 3
+
+
+def test_throttle_prefers_retry_after():
+    limiter = RateLimiter(base_delay=1.0)
+
+    assert 5.0 <= limiter.record_throttle("p", 5.0) <= 5.5
+
+
+def test_throttle_backs_off_exponentially_without_retry_after():
+    limiter = RateLimiter(base_delay=1.0, max_delay=4.0)
+
+    delays = [limiter.record_throttle("p", 0.0) for _ in range(4)]
+
+    for delay, expected in zip(delays, [1.0, 2.0, 4.0, 4.0]):
+        assert expected <= delay <= expected * 1.1
+
+
+def test_throttle_only_affects_its_scope():
+    limiter = RateLimiter(initial_concurrency=4)
+
+    limiter.record_throttle("p", 60.0, scope="a")
+
+    assert limiter._state("p", "a").limit == 2
+    assert limiter._state("p", "b").limit == 4
+    assert limiter._state("p", "b").blocked_until == 0.0
+
+
+def test_slot_drops_idle_scope():
+    limiter = RateLimiter()
+
+    async def run():
+        async with limiter.slot("p", "a"):
+            assert ("p", "a") in limiter._scopes
+
+    asyncio.run(run())
+    assert limiter._scopes == {}
+
+
+def test_slot_limits_concurrency():
+    limiter = RateLimiter(initial_concurrency=2)
+    running = peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.slot("p"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_call_with_retry_retries_transient_errors():
+    limiter = RateLimiter(base_delay=0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    result = asyncio.run(call_with_retry(call, "p", _transient, limiter=limiter))
+
+    assert result == "ok"
+    assert len(attempts) == 3
+
+
+def test_call_with_retry_raises_permanent_errors_at_once():
+    limiter = RateLimiter(base_delay=0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ValueError("not found")
+
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retry(call, "p", _transient, limiter=limiter))
+    assert len(attempts) == 1
+
+
+def test_call_with_retry_gives_up_after_max_retries():
+    limiter = RateLimiter(base_delay=0.001)
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(
+            call_with_retry(call, "p", _transient, max_retries=2, limiter=limiter)
+        )
+    assert len(attempts) == 3
+
+
+def test_with_retry_uses_scope_of_instance():
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__(base_delay=0.001)
+            self.scopes = []
+
+        def record_throttle(self, provider, retry_after, scope=None):
+            self.scopes.append(scope)
+            return super().record_throttle(provider, retry_after, scope)
+
+    limiter = RecordingLimiter()
+
+    class Client:
+        rate_limit_scope = "user"
+
+        def __init__(self):
+            self.attempts = 0
+
+        @with_retry(
+            "p",
+            _transient,
+            limiter=limiter,
+            scope=instance_scope,
+        )
+        async def fetch(self):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise ConnectionError("reset")
+            return self.attempts
+
+    assert asyncio.run(Client().fetch()) == 2
+    assert limiter.scopes == ["user"]
+
+
+class _RecordingLimiter(RateLimiter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retry_afters = []
+
+    def record_throttle(self, provider, retry_after, scope=None):
+        self.retry_afters.append(retry_after)
+        return super().record_throttle(provider, retry_after, scope)
+
+
+def test_resend_transient_resends_only_failed_keys():
+    limiter = _RecordingLimiter(base_delay=0.001)
+    sent = []
+
+    async def send(keys):
+        sent.append(keys)
+        return {key: 0.0 for key in keys if key == "b" and len(sent) < 3}
+
+    throttled = asyncio.run(
+        resend_transient(send, ["a", "b", "c"], "p", limiter=limiter)
+    )
+
+    assert throttled == {}
+    assert sent == [["a", "b", "c"], ["b"], ["b"]]
+
+
+def test_resend_transient_backs_off_exponentially_between_batches():
+    limiter = _RecordingLimiter(base_delay=0.001)
+
+    async def send(keys):
+        # Each batch call goes through the limiter and succeeds as a whole,
+        # which resets the scope's backoff
+        async with limiter.slot("p", "user"):
+            limiter.record_success("p", "user")
+        return {key: 0.0 for key in keys}
+
+    throttled = asyncio.run(
+        resend_transient(
+            send, ["a"], "p", scope="user", max_retries=3, limiter=limiter
+        )
+    )
+
+    assert throttled == {"a": 0.0}
+    assert limiter.retry_afters == [0.001, 0.002, 0.004]
+
+
+def test_resend_transient_prefers_retry_after():
+    limiter = _RecordingLimiter(base_delay=0.001)
+
+    async def send(keys):
+        return {"a": 0.0, "b": 0.002} if len(limiter.retry_afters) < 1 else {}
+
+    asyncio.run(resend_transient(send, ["a", "b"], "p", limiter=limiter))
+
+    assert limiter.retry_afters == [0.002]